@@ -0,0 +1,156 @@
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, RedirectResponse
+from urllib.parse import urlparse
+import json
+import logging
+import os
+import requests
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline import Sharding, check_capture_profiles, get_capture_profile
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler()]
+)
+logger = logging.getLogger(__name__)
+
+# Load configuration
+with open("../config.json", "r") as f:
+    config = json.load(f)
+    cameras = config["cameras"]
+    DETECT_SERVER_URL = config["detect_server_url"]  # Public address, served by this coordinator
+
+# Nodes would reject the same config, so fail here first
+try:
+    check_capture_profiles(config)
+except ValueError as e:
+    raise SystemExit(f"Invalid config.json: {e}")
+
+sharding = Sharding.from_config(config)
+if sharding is None:
+    raise SystemExit("Coordinator needs sharding nodes in config.json")
+
+# Long enough for a node to open a camera before answering
+PROXY_TIMEOUT = 70
+
+# Serialises writes to config.json, which only the coordinator makes in shard mode
+config_lock = threading.Lock()
+
+app = FastAPI()
+
+# Configure CORS
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+def owner_url(camera_id, request: Request):
+    """URL of the same request on the node that owns camera_id."""
+    if not any(cam["id"] == camera_id for cam in cameras):
+        raise HTTPException(status_code=404, detail="Camera not found")
+    url = sharding.owner_url(camera_id) + request.url.path
+    if request.url.query:
+        url += f"?{request.url.query}"
+    return url
+
+def proxy(camera_id, request: Request):
+    url = owner_url(camera_id, request)
+    try:
+        response = requests.get(url, timeout=PROXY_TIMEOUT)
+        return JSONResponse(status_code=response.status_code, content=response.json())
+    except (requests.RequestException, ValueError) as e:
+        logger.error(f"Error proxying {url}: {str(e)}")
+        raise HTTPException(status_code=502, detail=f"Node {sharding.owner(camera_id)} unreachable: {str(e)}")
+
+@app.get("/api/cameras")
+async def get_cameras():
+    return {"cameras": cameras}
+
+@app.post("/api/cameras")
+def add_camera(camera: dict):
+    try:
+        get_capture_profile(camera, config.get("capture_defaults"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    with config_lock:
+        cameras.append(camera)
+        with open("../config.json", "w") as f:
+            json.dump(config, f, indent=2)
+    return {"message": "Camera added", "camera": camera, "nodes": reload_nodes()}
+
+def reload_nodes():
+    """Ask every node to re-read config.json; nodes that are down load it when they start."""
+    results = {}
+    for node_id, url in sharding.nodes.items():
+        try:
+            response = requests.post(f"{url}/api/config/reload", timeout=5)
+            results[node_id] = "reloaded" if response.status_code == 200 else f"error {response.status_code}"
+        except requests.RequestException as e:
+            logger.error(f"Error reloading config on node {node_id}: {str(e)}")
+            results[node_id] = "unreachable"
+    return results
+
+@app.get("/api/config")
+async def get_config():
+    return config
+
+@app.get("/api/placement")
+async def get_placement():
+    return {"placement": sharding.placement(cameras)}
+
+@app.get("/api/nodes")
+def get_nodes():
+    nodes = []
+    for node_id, url in sharding.nodes.items():
+        try:
+            shard = requests.get(f"{url}/api/shard", timeout=2).json()
+            nodes.append({
+                "id": node_id,
+                "url": url,
+                "status": "up",
+                "capturing": shard["capturing"],
+                "failed": shard.get("failed", {}),
+            })
+        except Exception as e:
+            nodes.append({"id": node_id, "url": url, "status": "down", "error": str(e)})
+    return {"nodes": nodes}
+
+# MJPEG and JPEG bodies go straight from the owning node to the client
+@app.get("/video_feed/{camera_id}")
+async def video_feed(camera_id: str, request: Request):
+    return RedirectResponse(owner_url(camera_id, request), status_code=307)
+
+@app.get("/api/cameras/{camera_id}/snapshot")
+async def get_camera_snapshot(camera_id: str, request: Request):
+    return RedirectResponse(owner_url(camera_id, request), status_code=307)
+
+@app.get("/api/cameras/{camera_id}/stream")
+def get_camera_stream(camera_id: str, request: Request):
+    return proxy(camera_id, request)
+
+@app.get("/api/cameras/{camera_id}/status")
+def check_camera_status(camera_id: str, request: Request):
+    return proxy(camera_id, request)
+
+@app.get("/test_image")
+async def test_image():
+    return RedirectResponse(f"{next(iter(sharding.nodes.values()))}/test_image", status_code=307)
+
+@app.post("/testing_endpoint")
+async def testing_endpoint(data: dict):
+    logger.info(f"Received testing endpoint data: {data}")
+    return {"status": "received", "data": data}
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=urlparse(DETECT_SERVER_URL).port or 7000)
@@ -0,0 +1,38 @@
+"""Run every shard node from config.json and the coordinator on this machine."""
+import json
+import os
+import subprocess
+import sys
+import time
+
+SERVERS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def main():
+    with open(os.path.join(SERVERS_DIR, "config.json"), "r") as f:
+        config = json.load(f)
+
+    processes = []
+    try:
+        for node in config["sharding"]["nodes"]:
+            processes.append(subprocess.Popen(
+                [sys.executable, "detect_server.py"],
+                cwd=os.path.join(SERVERS_DIR, "detect-server"),
+                env={**os.environ, "DETECT_SHARD_ID": node["id"]},
+            ))
+        processes.append(subprocess.Popen(
+            [sys.executable, "coordinator.py"],
+            cwd=os.path.join(SERVERS_DIR, "coordinator"),
+        ))
+        # Stop the whole cluster as soon as one process exits
+        while all(process.poll() is None for process in processes):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+if __name__ == "__main__":
+    main()
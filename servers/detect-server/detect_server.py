@@ -1,15 +1,18 @@
-from fastapi import FastAPI, HTTPException, Response
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
-import cv2
-import mediapipe as mp
-import numpy as np
-import asyncio
+from fastapi.responses import RedirectResponse
+from urllib.parse import urlparse
 import json
 import logging
-import requests
+import os
+import re
+import sys
 import time
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline import (Pipeline, Sharding, check_capture_profiles, create_camera_router, get_capture_profile,
+                      get_capture_url, probe_camera)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -24,8 +27,38 @@ with open("../config.json", "r") as f:
     cameras = config["cameras"]
     DETECT_SERVER_URL = config["detect_server_url"]  # For video_feed endpoint
 
+# Fail at startup rather than when someone first opens a misconfigured camera
+try:
+    check_capture_profiles(config)
+except ValueError as e:
+    raise SystemExit(f"Invalid config.json: {e}")
+
+# Shard mode: DETECT_SHARD_ID=worker_1 python detect_server.py serves only the
+# cameras config["sharding"] places on worker_1, on that node's port
+SHARD_ID = os.environ.get("DETECT_SHARD_ID")
+sharding = Sharding.from_config(config) if SHARD_ID else None
+if SHARD_ID and (sharding is None or SHARD_ID not in sharding.nodes):
+    raise SystemExit(f"Shard {SHARD_ID} is not listed in config sharding nodes")
+NODE_URL = sharding.nodes[SHARD_ID] if sharding else DETECT_SERVER_URL
+
+# Requests for a single camera that must be served by the node owning it
+CAMERA_PATH = re.compile(r"^/(?:video_feed/([^/]+)|api/cameras/([^/]+)/(?:stream|snapshot|status))$")
+
 app = FastAPI()
 
+# Registered before CORS so redirects still carry CORS headers
+@app.middleware("http")
+async def redirect_to_owner(request: Request, call_next):
+    match = CAMERA_PATH.match(request.url.path) if sharding else None
+    if match:
+        owner = sharding.owner(match.group(1) or match.group(2))
+        if owner != SHARD_ID:
+            url = sharding.nodes[owner] + request.url.path
+            if request.url.query:
+                url += f"?{request.url.query}"
+            return RedirectResponse(url, status_code=307)
+    return await call_next(request)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -35,198 +68,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# HandDetector class from main.py
-class HandDetector:
-    def __init__(self):
-        self.mp_hands = mp.solutions.hands
-        self.hands = self.mp_hands.Hands(
-            static_image_mode=False,
-            max_num_hands=2,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5
-        )
-        self.mp_draw = mp.solutions.drawing_utils
-
-    def detect_hands(self, frame):
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.hands.process(rgb_frame)
-        bounding_boxes = []
-
-        if results.multi_hand_landmarks:
-            h, w, _ = frame.shape
-            for hand_landmarks in results.multi_hand_landmarks:
-                x_min = min([landmark.x for landmark in hand_landmarks.landmark])
-                y_min = min([landmark.y for landmark in hand_landmarks.landmark])
-                x_max = max([landmark.x for landmark in hand_landmarks.landmark])
-                y_max = max([landmark.y for landmark in hand_landmarks.landmark])
-
-                x_min_px = int(x_min * w)
-                y_min_px = int(y_min * h)
-                x_max_px = int(x_max * w)
-                y_max_px = int(y_max * h)
-
-                cv2.rectangle(frame, (x_min_px, y_min_px), (x_max_px, y_max_px), (0, 255, 0), 2)
-
-                bounding_boxes.append({
-                    "x": x_min * 100,
-                    "y": y_min * 100,
-                    "width": (x_max - x_min) * 100,
-                    "height": (y_max - y_min) * 100,
-                    "label": "Hand",
-                    "confidence": 0.95
-                })
-
-                self.mp_draw.draw_landmarks(frame, hand_landmarks, self.mp_hands.HAND_CONNECTIONS)
-
-        return frame, bounding_boxes
-
-    def is_hand_in_center(self, frame, x_min, y_min, x_max, y_max):
-        h, w, _ = frame.shape
-        center_x = w // 2
-        center_y = h // 2
-        center_width = int(w * 0.3)
-        center_height = int(h * 0.3)
-
-        center_x_min = center_x - center_width // 2
-        center_y_min = center_y - center_height // 2
-        center_x_max = center_x + center_width // 2
-        center_y_max = center_y + center_height // 2
-
-        return (x_min >= center_x_min and x_max <= center_x_max and
-                y_min >= center_y_min and y_max <= center_y_max)
-
-# Global camera instance
-cap = None
-detector = HandDetector()
-
-def get_camera(rtsp_url):
-    global cap
-    try:
-        if cap is None or not cap.isOpened():
-            logger.info(f"Connecting to camera at: {rtsp_url}")
-            cap = cv2.VideoCapture(rtsp_url, cv2.CAP_FFMPEG)
-            cap.set(cv2.CAP_PROP_BUFFERSIZE, 3)
-            cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'H264'))
-            cap.set(cv2.CAP_PROP_FPS, 30)
-            cap.set(cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, 60000)
-
-            if not cap.isOpened():
-                logger.error("Failed to open camera")
-                raise Exception("Failed to open camera")
-
-            ret, frame = cap.read()
-            if not ret or frame is None:
-                logger.error("Failed to read frame from camera")
-                raise Exception("Failed to read frame from camera")
-
-            logger.info("Camera connected successfully")
-            return cap
-    except Exception as e:
-        logger.error(f"Error connecting to camera: {str(e)}")
-        if cap is not None:
-            cap.release()
-            cap = None
-        raise HTTPException(status_code=500, detail=f"Camera connection error: {str(e)}")
-    return cap
-
-def generate_frames(rtsp_url, camera_id):
-    try:
-        camera = get_camera(rtsp_url)
-        logger.info("Starting frame streaming")
-        last_sent_time = 0
-
-        while True:
-            try:
-                ret, frame = camera.read()
-                if not ret or frame is None:
-                    logger.error("Failed to read frame, reconnecting...")
-                    camera = get_camera(rtsp_url)
-                    continue
-
-                frame = cv2.flip(frame, 1)
-                frame, bounding_boxes = detector.detect_hands(frame)
-
-                for box in bounding_boxes:
-                    h, w, _ = frame.shape
-                    x_min_px = int(box["x"] * w / 100)
-                    y_min_px = int(box["y"] * h / 100)
-                    x_max_px = int((box["x"] + box["width"]) * w / 100)
-                    y_max_px = int((box["y"] + box["height"]) * h / 100)
-
-                    if detector.is_hand_in_center(frame, x_min_px, y_min_px, x_max_px, y_max_px):
-                        current_time = time.time()
-                        if current_time - last_sent_time > 5:
-                            data = {
-                                "event": "hand_in_center",
-                                "timestamp": current_time,
-                                "camera_id": camera_id,
-                            }
-                            try:
-                                response = requests.post(f"{DETECT_SERVER_URL}/testing_endpoint", json=data, timeout=5)
-                                if response.status_code == 200:
-                                    logger.info(f"Data sent successfully: {data}")
-                                    last_sent_time = current_time
-                                else:
-                                    logger.error(f"Error sending data: {response.status_code} - {response.text}")
-                            except Exception as e:
-                                logger.error(f"Error sending request: {str(e)}")
-
-                ret, buffer = cv2.imencode('.jpg', frame)
-                if not ret:
-                    logger.error("Failed to encode frame")
-                    continue
+def pipeline_settings(config):
+    """Pipeline options read from config; applied again when the config is reloaded."""
+    return {
+        "capture_defaults": config.get("capture_defaults"),
+        "idle_timeout": config.get("capture_idle_timeout", 60),
+        "max_frame_age": config.get("max_frame_age", 10),
+        "default_detector": config.get("detector", "hand"),
+    }
 
-                frame_bytes = buffer.tobytes()
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+pipeline = Pipeline(event_url=f"{DETECT_SERVER_URL}/testing_endpoint", **pipeline_settings(config))
 
-                time.sleep(0.033)  # ~30 FPS
-            except Exception as e:
-                logger.error(f"Error generating frame: {str(e)}")
-                time.sleep(1)
-                continue
-    except Exception as e:
-        logger.error(f"Critical error in generate_frames: {str(e)}")
-        raise Exception(str(e))
-
-# APIs from main.py
-@app.get("/api/cameras/{camera_id}/stream")
-async def get_camera_stream(camera_id: str):
-    camera = next((cam for cam in cameras if cam["id"] == camera_id), None)
-    if not camera:
-        raise HTTPException(status_code=404, detail="Camera not found")
+def find_camera(camera_id):
+    return next((cam for cam in cameras if cam["id"] == camera_id), None)
 
-    try:
-        logger.info(f"Stream request for camera {camera_id}")
-        camera = get_camera(camera["rtsp_url"])
-        logger.info(f"Stream for camera {camera_id} ready")
-        return {
-            "streamUrl": f"{DETECT_SERVER_URL}/video_feed/{camera_id}",
-            "cameraId": camera_id,
-            "status": "connected"
-        }
-    except Exception as e:
-        logger.error(f"Error getting stream for camera {camera_id}: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Camera error: {str(e)}")
-
-@app.get("/video_feed/{camera_id}")
-async def video_feed(camera_id: str):
-    camera = next((cam for cam in cameras if cam["id"] == camera_id), None)
-    if not camera:
-        raise HTTPException(status_code=404, detail="Camera not found")
-
-    return StreamingResponse(
-        generate_frames(camera["rtsp_url"], camera_id),
-        media_type="multipart/x-mixed-replace; boundary=frame"
-    )
-
-@app.get("/test_image")
-async def test_image():
-    frame = cv2.imread("test.jpg")
-    if frame is None:
-        raise HTTPException(status_code=404, detail="Test image not found")
-    ret, buffer = cv2.imencode('.jpg', frame)
-    return Response(content=buffer.tobytes(), media_type="image/jpeg")
+# Stream, video feed, snapshot and test image endpoints
+app.include_router(create_camera_router(pipeline, find_camera, NODE_URL))
 
 @app.post("/testing_endpoint")
 async def testing_endpoint(data: dict):
@@ -239,17 +96,22 @@ async def get_cameras():
     return {"cameras": cameras}
 
 @app.get("/api/cameras/{camera_id}/status")
-async def check_camera_status(camera_id: str):
-    camera = next((cam for cam in cameras if cam["id"] == camera_id), None)
+def check_camera_status(camera_id: str):
+    camera = find_camera(camera_id)
     if not camera:
         raise HTTPException(status_code=404, detail="Camera not found")
 
+    worker = pipeline.get_worker(camera_id)
+    # A camera that is already being captured is answered from its capture loop
+    if worker is not None:
+        entry, error = pipeline.frame_status(worker)
+        if entry is not None:
+            return {"camera_id": camera_id, "status": "connected", "frame_age": round(time.time() - entry["timestamp"], 3)}
+        return {"camera_id": camera_id, "status": "disconnected", "error": error or "No frame received yet"}
+
     try:
-        cap = cv2.VideoCapture(camera["rtsp_url"], cv2.CAP_FFMPEG)
-        if not cap.isOpened():
-            raise Exception("Failed to connect")
-        ret, _ = cap.read()
-        cap.release()
+        profile = get_capture_profile(camera, pipeline.capture_defaults)
+        ret = probe_camera(get_capture_url(camera, profile), profile["keyframe_only"])
         return {"camera_id": camera_id, "status": "connected" if ret else "disconnected"}
     except Exception as e:
         logger.error(f"Error checking camera {camera_id}: {str(e)}")
@@ -257,6 +119,15 @@ async def check_camera_status(camera_id: str):
 
 @app.post("/api/cameras")
 async def add_camera(camera: dict):
+    # In shard mode the coordinator owns config.json and tells every node to reload it
+    if sharding:
+        return RedirectResponse(f"{DETECT_SERVER_URL}/api/cameras", status_code=307)
+
+    try:
+        get_capture_profile(camera, config.get("capture_defaults"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     cameras.append(camera)
     with open("../config.json", "w") as f:
         json.dump(config, f, indent=2)
@@ -266,14 +137,39 @@ async def add_camera(camera: dict):
 async def get_config():
     return config
 
+@app.post("/api/config/reload")
+async def reload_config():
+    """Re-read config.json; detect_server_url and sharding only change on restart."""
+    with open("../config.json", "r") as f:
+        latest = json.load(f)
+    try:
+        check_capture_profiles(latest)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid config.json: {e}")
+    # Update in place since find_camera and the routes hold on to these objects
+    cameras[:] = latest["cameras"]
+    latest["cameras"] = cameras
+    config.clear()
+    config.update(latest)
+    pipeline.update(cameras, **pipeline_settings(config))
+    logger.info(f"Config reloaded, {len(cameras)} cameras")
+    return {"message": "Config reloaded", "cameras": len(cameras)}
+
+@app.get("/api/shard")
+async def get_shard():
+    owned = [cam["id"] for cam in cameras if not sharding or sharding.owner(cam["id"]) == SHARD_ID]
+    return {
+        "node": SHARD_ID,
+        "url": NODE_URL,
+        "cameras": owned,
+        "capturing": pipeline.capturing(),
+        "failed": pipeline.failures(),
+    }
+
 @app.on_event("shutdown")
 async def shutdown_event():
-    global cap
-    if cap is not None:
-        cap.release()
-        cap = None
-        logger.info("Camera released")
+    pipeline.shutdown()
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=7000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=urlparse(NODE_URL).port if sharding else 7000)
\ No newline at end of file
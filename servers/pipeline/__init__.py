@@ -0,0 +1,11 @@
+"""Camera capture, detection and streaming shared by main.py and the detect server.
+
+Importing this package does not load cv2 or mediapipe; they are imported when a
+camera capture actually starts.
+"""
+from .api import create_camera_router
+from .capture import CAPTURE_DEFAULTS, check_capture_profiles, get_capture_profile, get_capture_url, open_camera, probe_camera
+from .detectors import Detector, load_detector, register_detector
+from .frame_cache import FrameCache
+from .sharding import HashRing, Sharding
+from .worker import CameraWorker, Pipeline
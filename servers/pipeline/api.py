@@ -0,0 +1,97 @@
+import logging
+from functools import lru_cache
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=1)
+def load_test_image():
+    with open("test.jpg", "rb") as f:
+        return f.read()
+
+def etag_matches(etag, if_none_match):
+    """Weak comparison of etag against an If-None-Match header, as GET requests allow."""
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+def create_camera_router(pipeline, find_camera, stream_base_url):
+    """Build the stream, video feed and snapshot endpoints on top of pipeline.
+
+    find_camera(camera_id) returns the camera config dict or None.
+    """
+    router = APIRouter()
+
+    def get_camera_or_404(camera_id):
+        camera = find_camera(camera_id)
+        if not camera:
+            raise HTTPException(status_code=404, detail="Camera not found")
+        return camera
+
+    @router.get("/api/cameras/{camera_id}/stream")
+    def get_camera_stream(camera_id: str):
+        camera = get_camera_or_404(camera_id)
+
+        try:
+            logger.info(f"Stream request for camera {camera_id}")
+            pipeline.wait_until_ready(camera)
+            logger.info(f"Stream for camera {camera_id} ready")
+            return {
+                "streamUrl": f"{stream_base_url}/video_feed/{camera_id}",
+                "cameraId": camera_id,
+                "status": "connected"
+            }
+        except Exception as e:
+            logger.error(f"Error getting stream for camera {camera_id}: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Camera error: {str(e)}")
+
+    @router.get("/video_feed/{camera_id}")
+    async def video_feed(camera_id: str):
+        camera = get_camera_or_404(camera_id)
+
+        return StreamingResponse(
+            pipeline.generate_frames(camera, find_camera),
+            media_type="multipart/x-mixed-replace; boundary=frame"
+        )
+
+    @router.get("/api/cameras/{camera_id}/snapshot")
+    def get_camera_snapshot(camera_id: str, request: Request, width: Optional[int] = Query(None, ge=16, le=3840)):
+        camera = get_camera_or_404(camera_id)
+
+        worker = pipeline.ensure_capture(camera)
+        entry, error = pipeline.frame_status(worker)
+        if entry is None:
+            detail = f"Camera error: {error}" if error else "No frame available yet"
+            raise HTTPException(status_code=503, detail=detail, headers={"Retry-After": "1"})
+
+        etag = f'"{pipeline.frame_cache.epoch}-{entry["seq"]}-{width or "full"}"'
+        headers = {
+            "ETag": etag,
+            "Cache-Control": "no-cache",
+            "X-Frame-Timestamp": f"{entry['timestamp']:.3f}",
+        }
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and etag_matches(etag, if_none_match):
+            return Response(status_code=304, headers=headers)
+
+        try:
+            jpeg = pipeline.frame_cache.get_variant(entry, width)
+        except Exception as e:
+            logger.error(f"Error encoding snapshot for camera {camera_id}: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Camera error: {str(e)}")
+        return Response(content=jpeg, media_type="image/jpeg", headers=headers)
+
+    @router.get("/test_image")
+    async def test_image():
+        try:
+            return Response(content=load_test_image(), media_type="image/jpeg")
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="Test image not found")
+
+    return router
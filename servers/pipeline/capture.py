@@ -0,0 +1,121 @@
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Per-camera "capture" settings override these, via config["capture_defaults"]:
+#   stream: "main" or "sub" (uses the camera's sub_rtsp_url when present)
+#   width: downscale decoded frames to this width before detection and encoding
+#   process_every: only retrieve every Nth frame, the others are grab()bed and dropped
+#   keyframe_only: have FFmpeg discard non-keyframe packets before they reach the decoder
+CAPTURE_DEFAULTS = {
+    "stream": "main",
+    "width": None,
+    "process_every": 1,
+    "keyframe_only": False,
+}
+
+# OPENCV_FFMPEG_CAPTURE_OPTIONS is process-wide and read when a capture opens.
+# OpenCV only defaults to rtsp_transport;tcp when the variable is unset.
+BASE_FFMPEG_OPTIONS = os.environ.get("OPENCV_FFMPEG_CAPTURE_OPTIONS") or "rtsp_transport;tcp"
+
+# Opens sharing the same options run concurrently; a different value waits for them, but
+# only briefly: OpenCV reads the variable as an open starts, while the open itself can
+# block for the whole connect timeout on an offline camera
+FFMPEG_OPTIONS_WAIT = 1
+_ffmpeg_options_cond = threading.Condition()
+_ffmpeg_options_state = {"value": None, "opening": 0}
+
+@contextmanager
+def ffmpeg_options(keyframe_only=False):
+    """Hold OPENCV_FFMPEG_CAPTURE_OPTIONS at the value for this capture while it opens."""
+    value = BASE_FFMPEG_OPTIONS + ("|avdiscard;nonkey" if keyframe_only else "")
+    with _ffmpeg_options_cond:
+        ready = _ffmpeg_options_cond.wait_for(
+            lambda: _ffmpeg_options_state["opening"] == 0 or _ffmpeg_options_state["value"] == value,
+            FFMPEG_OPTIONS_WAIT)
+        if not ready:
+            logger.warning(f"Capture opens with {_ffmpeg_options_state['value']!r} still pending, switching to {value!r}")
+        if _ffmpeg_options_state["value"] != value:
+            os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = value
+            _ffmpeg_options_state["value"] = value
+        _ffmpeg_options_state["opening"] += 1
+    try:
+        yield
+    finally:
+        with _ffmpeg_options_cond:
+            _ffmpeg_options_state["opening"] -= 1
+            _ffmpeg_options_cond.notify_all()
+
+def get_capture_profile(camera, defaults=None):
+    """Merge the capture settings of camera over defaults; raises ValueError on invalid values."""
+    name = f"Camera {camera.get('id')}"
+    overrides = camera.get("capture") or {}
+    if not isinstance(defaults or {}, dict) or not isinstance(overrides, dict):
+        raise ValueError(f"{name}: capture settings must be an object")
+    profile = {**CAPTURE_DEFAULTS, **(defaults or {}), **overrides}
+
+    if profile["stream"] not in ("main", "sub"):
+        raise ValueError(f"{name}: capture stream must be \"main\" or \"sub\", got {profile['stream']!r}")
+    if not isinstance(profile["keyframe_only"], bool):
+        raise ValueError(f"{name}: capture keyframe_only must be true or false, got {profile['keyframe_only']!r}")
+    for key, minimum in (("width", 16), ("process_every", 1)):
+        if key == "width" and profile[key] is None:
+            continue
+        try:
+            # int(True) is 1, so booleans have to be rejected explicitly
+            if isinstance(profile[key], bool):
+                raise TypeError
+            profile[key] = int(profile[key])
+        except (TypeError, ValueError):
+            raise ValueError(f"{name}: capture {key} must be an integer, got {profile[key]!r}")
+        if profile[key] < minimum:
+            raise ValueError(f"{name}: capture {key} must be at least {minimum}, got {profile[key]}")
+
+    return profile
+
+def check_capture_profiles(config):
+    """Validate the capture profile of every camera in config, raising ValueError on the first bad one."""
+    for camera in config["cameras"]:
+        get_capture_profile(camera, config.get("capture_defaults"))
+
+def get_capture_url(camera, profile):
+    if profile["stream"] == "sub":
+        if camera.get("sub_rtsp_url"):
+            return camera["sub_rtsp_url"]
+        logger.warning(f"Camera {camera['id']} has no sub_rtsp_url, using main stream")
+    return camera["rtsp_url"]
+
+def open_camera(rtsp_url, keyframe_only=False, timeout=60):
+    import cv2
+
+    logger.info(f"Connecting to camera at: {rtsp_url}")
+    # Timeouts only apply when passed at open time; FOURCC/FPS are ignored for network streams
+    params = [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, timeout * 1000]
+
+    with ffmpeg_options(keyframe_only):
+        cap = cv2.VideoCapture(rtsp_url, cv2.CAP_FFMPEG, params)
+
+    if not cap.isOpened():
+        cap.release()
+        logger.error("Failed to open camera")
+        raise Exception("Failed to open camera")
+
+    logger.info("Camera connected successfully")
+    return cap
+
+def probe_camera(rtsp_url, keyframe_only=False):
+    """Open rtsp_url once and report whether a frame could be read."""
+    import cv2
+
+    with ffmpeg_options(keyframe_only):
+        cap = cv2.VideoCapture(rtsp_url, cv2.CAP_FFMPEG)
+    try:
+        if not cap.isOpened():
+            raise Exception("Failed to connect")
+        ret, _ = cap.read()
+        return ret
+    finally:
+        cap.release()
@@ -0,0 +1,22 @@
+import importlib
+
+from .base import Detector
+
+# Detector name -> "module:Class"; modules are imported on first use so
+# mediapipe and friends are only loaded when a camera needs them
+DETECTORS = {
+    "hand": f"{__name__}.hand:HandDetector",
+}
+
+def register_detector(name, path):
+    """Make the detector class at "module:Class" available under name."""
+    DETECTORS[name] = path
+
+def load_detector(name, **options):
+    """Create a detector by registered name or by "module:Class" path."""
+    path = DETECTORS.get(name, name)
+    module_name, sep, class_name = path.partition(":")
+    if not sep:
+        raise ValueError(f"Unknown detector: {name}")
+    detector_class = getattr(importlib.import_module(module_name), class_name)
+    return detector_class(**options)
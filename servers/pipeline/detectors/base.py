@@ -0,0 +1,20 @@
+from abc import ABC, abstractmethod
+
+
+class Detector(ABC):
+    """Interface for frame detectors.
+
+    Every capture loop creates its own instance, so detectors may keep
+    per-stream tracking state without locking.
+    """
+
+    @abstractmethod
+    def detect(self, frame):
+        """Annotate frame and return (frame, bounding_boxes), boxes in percent of the frame size."""
+
+    def get_events(self, frame, bounding_boxes):
+        """Return the names of events triggered by this frame."""
+        return []
+
+    def close(self):
+        pass
@@ -0,0 +1,82 @@
+import cv2
+import mediapipe as mp
+
+from .base import Detector
+
+
+class HandDetector(Detector):
+    def __init__(self, max_num_hands=2, min_detection_confidence=0.5, min_tracking_confidence=0.5):
+        self.mp_hands = mp.solutions.hands
+        self.hands = self.mp_hands.Hands(
+            static_image_mode=False,
+            max_num_hands=max_num_hands,
+            min_detection_confidence=min_detection_confidence,
+            min_tracking_confidence=min_tracking_confidence
+        )
+        self.mp_draw = mp.solutions.drawing_utils
+
+    def detect(self, frame):
+        return self.detect_hands(frame)
+
+    def get_events(self, frame, bounding_boxes):
+        h, w, _ = frame.shape
+        for box in bounding_boxes:
+            x_min_px = int(box["x"] * w / 100)
+            y_min_px = int(box["y"] * h / 100)
+            x_max_px = int((box["x"] + box["width"]) * w / 100)
+            y_max_px = int((box["y"] + box["height"]) * h / 100)
+
+            if self.is_hand_in_center(frame, x_min_px, y_min_px, x_max_px, y_max_px):
+                return ["hand_in_center"]
+        return []
+
+    def close(self):
+        self.hands.close()
+
+    def detect_hands(self, frame):
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        results = self.hands.process(rgb_frame)
+        bounding_boxes = []
+
+        if results.multi_hand_landmarks:
+            h, w, _ = frame.shape
+            for hand_landmarks in results.multi_hand_landmarks:
+                x_min = min([landmark.x for landmark in hand_landmarks.landmark])
+                y_min = min([landmark.y for landmark in hand_landmarks.landmark])
+                x_max = max([landmark.x for landmark in hand_landmarks.landmark])
+                y_max = max([landmark.y for landmark in hand_landmarks.landmark])
+
+                x_min_px = int(x_min * w)
+                y_min_px = int(y_min * h)
+                x_max_px = int(x_max * w)
+                y_max_px = int(y_max * h)
+
+                cv2.rectangle(frame, (x_min_px, y_min_px), (x_max_px, y_max_px), (0, 255, 0), 2)
+
+                bounding_boxes.append({
+                    "x": x_min * 100,
+                    "y": y_min * 100,
+                    "width": (x_max - x_min) * 100,
+                    "height": (y_max - y_min) * 100,
+                    "label": "Hand",
+                    "confidence": 0.95
+                })
+
+                self.mp_draw.draw_landmarks(frame, hand_landmarks, self.mp_hands.HAND_CONNECTIONS)
+
+        return frame, bounding_boxes
+
+    def is_hand_in_center(self, frame, x_min, y_min, x_max, y_max):
+        h, w, _ = frame.shape
+        center_x = w // 2
+        center_y = h // 2
+        center_width = int(w * 0.3)
+        center_height = int(h * 0.3)
+
+        center_x_min = center_x - center_width // 2
+        center_y_min = center_y - center_height // 2
+        center_x_max = center_x + center_width // 2
+        center_y_max = center_y + center_height // 2
+
+        return (x_min >= center_x_min and x_max <= center_x_max and
+                y_min >= center_y_min and y_max <= center_y_max)
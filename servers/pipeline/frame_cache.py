@@ -0,0 +1,86 @@
+import threading
+import time
+
+
+class FrameCache:
+    """Most recent encoded frame of every camera, shared by MJPEG streams and snapshots."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._slots = {}
+        # Part of every ETag so sequence numbers from a previous run never match
+        self.epoch = format(int(time.time()), "x")
+
+    def _slot(self, camera_id):
+        with self._lock:
+            slot = self._slots.get(camera_id)
+            if slot is None:
+                slot = {"cond": threading.Condition(), "entry": None, "seq": 0}
+                self._slots[camera_id] = slot
+            return slot
+
+    def publish(self, camera_id, frame, jpeg, source=None):
+        slot = self._slot(camera_id)
+        with slot["cond"]:
+            slot["entry"] = {
+                # Sequence numbers keep counting across clear() so ETags stay unique
+                "seq": slot["seq"] + 1,
+                "source": source,
+                "timestamp": time.time(),
+                "frame": frame,
+                "jpeg": jpeg,
+                "variants": {},
+                "variants_lock": threading.Lock(),
+            }
+            slot["seq"] = slot["entry"]["seq"]
+            slot["cond"].notify_all()
+
+    def clear(self, camera_id, source=None):
+        """Drop the cached frame of camera_id, only if it was published by source when given."""
+        slot = self._slot(camera_id)
+        with slot["cond"]:
+            if slot["entry"] is not None and (source is None or slot["entry"]["source"] is source):
+                slot["entry"] = None
+
+    def get(self, camera_id):
+        return self._slot(camera_id)["entry"]
+
+    def notify(self, camera_id):
+        """Wake up everyone waiting on camera_id so they re-check their abort condition."""
+        slot = self._slot(camera_id)
+        with slot["cond"]:
+            slot["cond"].notify_all()
+
+    def wait_for_frame(self, camera_id, after_seq=0, timeout=None, abort=None):
+        """Block until a frame newer than after_seq is published, or return None on timeout.
+
+        abort() is re-checked whenever notify() is called for camera_id and ends the wait early.
+        """
+        slot = self._slot(camera_id)
+        with slot["cond"]:
+            slot["cond"].wait_for(
+                lambda: (slot["entry"] is not None and slot["entry"]["seq"] > after_seq) or (abort is not None and abort()),
+                timeout)
+            entry = slot["entry"]
+        if entry is None or entry["seq"] <= after_seq:
+            return None
+        return entry
+
+    def get_variant(self, entry, width=None):
+        """Return the JPEG of entry scaled down to width, encoding each size at most once per frame."""
+        h, w, _ = entry["frame"].shape
+        if width is None or width >= w:
+            return entry["jpeg"]
+        # Held while encoding so concurrent pollers of the same size wait for one encode
+        with entry["variants_lock"]:
+            jpeg = entry["variants"].get(width)
+            if jpeg is None:
+                import cv2
+
+                resized = cv2.resize(entry["frame"], (width, max(1, round(h * width / w))), interpolation=cv2.INTER_AREA)
+                ret, buffer = cv2.imencode('.jpg', resized)
+                if not ret:
+                    raise Exception("Failed to encode snapshot")
+                jpeg = buffer.tobytes()
+                entry["variants"][width] = jpeg
+        return jpeg
@@ -0,0 +1,48 @@
+import bisect
+import hashlib
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    """Consistent hash ring; adding or removing a node only moves the keys it owned."""
+
+    def __init__(self, node_ids, replicas=100):
+        self._ring = sorted((_hash(f"{node_id}#{i}"), node_id) for node_id in node_ids for i in range(replicas))
+        self._keys = [key for key, _ in self._ring]
+
+    def owner(self, key):
+        if not self._ring:
+            raise ValueError("Hash ring has no nodes")
+        index = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+        return self._ring[index][1]
+
+
+class Sharding:
+    """Placement of cameras on detect server nodes, from config["sharding"]."""
+
+    def __init__(self, nodes, replicas=100):
+        self.nodes = {node["id"]: node["url"].rstrip("/") for node in nodes}
+        self.ring = HashRing(list(self.nodes), replicas)
+
+    @classmethod
+    def from_config(cls, config):
+        """Return the configured Sharding, or None when no nodes are listed."""
+        sharding = config.get("sharding") or {}
+        if not sharding.get("nodes"):
+            return None
+        return cls(sharding["nodes"], sharding.get("replicas", 100))
+
+    def owner(self, camera_id):
+        return self.ring.owner(camera_id)
+
+    def owner_url(self, camera_id):
+        return self.nodes[self.owner(camera_id)]
+
+    def placement(self, cameras):
+        return {
+            camera["id"]: {"node": self.owner(camera["id"]), "url": self.owner_url(camera["id"])}
+            for camera in cameras
+        }
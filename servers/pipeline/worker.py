@@ -0,0 +1,304 @@
+import logging
+import queue
+import threading
+import time
+
+import requests
+
+from .capture import get_capture_profile, get_capture_url, open_camera
+from .detectors import load_detector
+from .frame_cache import FrameCache
+
+logger = logging.getLogger(__name__)
+
+EVENT_INTERVAL = 5  # Minimum seconds between two events of the same kind from one camera
+EVENT_QUEUE_SIZE = 100  # Events waiting to be posted; further ones are dropped while the receiver is slow
+FAILURE_BACKOFF = 30  # Seconds a worker that failed to start keeps reporting its error before a retry
+
+
+class CameraWorker:
+    """Single capture loop per camera that runs detection and publishes encoded frames to the frame cache."""
+
+    def __init__(self, pipeline, camera):
+        self.pipeline = pipeline
+        self.camera = camera
+        self.camera_id = camera["id"]
+        self.started_at = time.time()
+        self.last_access = self.started_at
+        self.last_error = None
+        self.failed_at = None
+        self._last_sent = {}
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"capture-{self.camera_id}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _is_idle(self):
+        # Checked under the pipeline lock so ensure_capture never hands out a worker that is about to exit
+        with self.pipeline.workers_lock:
+            if time.time() - self.last_access <= self.pipeline.idle_timeout:
+                return False
+            self.pipeline._forget(self)
+            return True
+
+    def _send_event(self, event):
+        current_time = time.time()
+        if current_time - self._last_sent.get(event, 0) <= EVENT_INTERVAL or not self.pipeline.event_url:
+            return
+
+        # Counted as sent even if the POST fails, so a down receiver is not retried every frame
+        self._last_sent[event] = current_time
+        self.pipeline.send_event({
+            "event": event,
+            "timestamp": current_time,
+            "camera_id": self.camera_id,
+        })
+
+    def _run(self):
+        import cv2
+
+        cap = None
+        detector = None
+        frame_index = 0
+        detector_name = self.camera.get("detector", self.pipeline.default_detector)
+
+        try:
+            profile = get_capture_profile(self.camera, self.pipeline.capture_defaults)
+            process_every = profile["process_every"]
+            if detector_name:
+                detector = load_detector(detector_name, **self.camera.get("detector_options", {}))
+
+            while not self._stop_event.is_set():
+                if self._is_idle():
+                    logger.info(f"No viewers for camera {self.camera_id}, stopping capture")
+                    break
+
+                try:
+                    if cap is None:
+                        cap = open_camera(get_capture_url(self.camera, profile), profile["keyframe_only"],
+                                          self.pipeline.connect_timeout)
+                        frame_index = 0
+
+                    # grab() demuxes and decodes but skips the colour conversion and copy of retrieve()
+                    if not cap.grab():
+                        logger.error("Failed to read frame, reconnecting...")
+                        self.last_error = "Failed to read frame"
+                        cap.release()
+                        cap = None
+                        self._stop_event.wait(1)
+                        continue
+
+                    frame_index += 1
+                    if (frame_index - 1) % process_every:
+                        continue
+
+                    ret, frame = cap.retrieve()
+                    if not ret or frame is None:
+                        logger.error("Failed to retrieve frame")
+                        continue
+
+                    if profile["width"] and frame.shape[1] > profile["width"]:
+                        h, w, _ = frame.shape
+                        frame = cv2.resize(frame, (profile["width"], round(h * profile["width"] / w)), interpolation=cv2.INTER_AREA)
+
+                    frame = cv2.flip(frame, 1)
+                    if detector is not None:
+                        frame, bounding_boxes = detector.detect(frame)
+                        for event in detector.get_events(frame, bounding_boxes):
+                            self._send_event(event)
+
+                    ret, buffer = cv2.imencode('.jpg', frame)
+                    if not ret:
+                        logger.error("Failed to encode frame")
+                        continue
+
+                    self.pipeline.frame_cache.publish(self.camera_id, frame, buffer.tobytes(), source=self)
+                    self.last_error = None
+                except Exception as e:
+                    logger.error(f"Error capturing camera {self.camera_id}: {str(e)}")
+                    self.last_error = str(e)
+                    if cap is not None:
+                        cap.release()
+                        cap = None
+                    self._stop_event.wait(1)
+        except Exception as e:
+            # Invalid capture profile or detector could not be created; stay registered so requests see the error until ensure_capture retries
+            logger.error(f"Error starting camera {self.camera_id}: {str(e)}")
+            self.last_error = str(e)
+            self.failed_at = time.time()
+            self.pipeline.frame_cache.notify(self.camera_id)
+        finally:
+            if cap is not None:
+                cap.release()
+            if detector is not None:
+                detector.close()
+            # Snapshots must not keep serving this capture's last frame once it is gone
+            self.pipeline.frame_cache.clear(self.camera_id, source=self)
+            logger.info(f"Camera {self.camera_id} released")
+
+
+class Pipeline:
+    """Owns the capture loops and frame cache of one server process."""
+
+    def __init__(self, event_url=None, capture_defaults=None, idle_timeout=60, connect_timeout=60,
+                 default_detector="hand", max_frame_age=10):
+        self.event_url = event_url
+        self.capture_defaults = capture_defaults or {}
+        self.idle_timeout = idle_timeout  # Seconds without viewers before capture stops
+        self.connect_timeout = connect_timeout
+        self.default_detector = default_detector
+        self.max_frame_age = max_frame_age  # Older cached frames are not served as the current one
+        self.frame_cache = FrameCache()
+        # Running capture loops, keyed by camera id
+        self.workers = {}
+        self.workers_lock = threading.Lock()
+        # Events are posted from their own thread so a slow receiver never stalls capture
+        self._events = queue.Queue(maxsize=EVENT_QUEUE_SIZE)
+        self._event_thread = None
+        self._event_thread_lock = threading.Lock()
+
+    def send_event(self, data):
+        """Queue data to be posted to event_url without blocking the caller."""
+        if not self.event_url:
+            return
+        with self._event_thread_lock:
+            if self._event_thread is None:
+                self._event_thread = threading.Thread(target=self._post_events, name="events", daemon=True)
+                self._event_thread.start()
+        try:
+            self._events.put_nowait(data)
+        except queue.Full:
+            logger.warning(f"Event queue full, dropping event: {data}")
+
+    def _post_events(self):
+        while True:
+            data = self._events.get()
+            try:
+                response = requests.post(self.event_url, json=data, timeout=5)
+                if response.status_code == 200:
+                    logger.info(f"Data sent successfully: {data}")
+                else:
+                    logger.error(f"Error sending data: {response.status_code} - {response.text}")
+            except Exception as e:
+                logger.error(f"Error sending request: {str(e)}")
+
+    def _forget(self, worker):
+        # Caller holds workers_lock
+        if self.workers.get(worker.camera_id) is worker:
+            del self.workers[worker.camera_id]
+
+    def _drop_expired_failures(self):
+        # Caller holds workers_lock
+        now = time.time()
+        for camera_id, worker in list(self.workers.items()):
+            if worker.failed_at and now - worker.failed_at >= FAILURE_BACKOFF:
+                del self.workers[camera_id]
+
+    def get_worker(self, camera_id):
+        """Return the capture loop of camera_id, or None when it is not being captured."""
+        with self.workers_lock:
+            self._drop_expired_failures()
+            return self.workers.get(camera_id)
+
+    def capturing(self):
+        """Return the ids of cameras with a running capture loop."""
+        with self.workers_lock:
+            return [camera_id for camera_id, worker in self.workers.items() if not worker.failed_at]
+
+    def failures(self):
+        """Return {camera_id: error} for captures that failed to start and are waiting out their backoff."""
+        with self.workers_lock:
+            self._drop_expired_failures()
+            return {camera_id: worker.last_error for camera_id, worker in self.workers.items() if worker.failed_at}
+
+    def ensure_capture(self, camera):
+        """Start the capture loop for camera if needed and mark it as in use."""
+        with self.workers_lock:
+            self._drop_expired_failures()
+            worker = self.workers.get(camera["id"])
+            if worker is None:
+                worker = CameraWorker(self, camera)
+                self.workers[camera["id"]] = worker
+                worker.start()
+            worker.last_access = time.time()
+            return worker
+
+    def frame_status(self, worker):
+        """Return (entry, error) for worker; entry is None unless it holds a recent frame of this capture."""
+        if worker.last_error:
+            return None, worker.last_error
+        entry = self.frame_cache.get(worker.camera_id)
+        if entry is None or entry["timestamp"] < worker.started_at:
+            return None, None
+        age = time.time() - entry["timestamp"]
+        if age > self.max_frame_age:
+            return None, f"No new frame for {age:.0f}s"
+        return entry, None
+
+    def wait_until_ready(self, camera):
+        """Start capturing camera and block until it has produced a frame."""
+        worker = self.ensure_capture(camera)
+        deadline = time.time() + self.connect_timeout
+
+        while worker.failed_at is None:
+            entry, _ = self.frame_status(worker)
+            if entry is not None:
+                return
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise Exception(f"Camera connection error: {worker.last_error or 'no frame received'}")
+            current = self.frame_cache.get(camera["id"])
+            self.frame_cache.wait_for_frame(camera["id"], current["seq"] if current else 0, min(1, remaining),
+                                            abort=lambda: worker.failed_at is not None)
+
+        raise Exception(worker.last_error)
+
+    def generate_frames(self, camera, find_camera=None):
+        """Yield MJPEG parts of camera; find_camera(camera_id) picks up config reloads while streaming."""
+        self.ensure_capture(camera)
+        logger.info(f"Starting frame streaming for camera {camera['id']}")
+        seq = 0
+
+        while True:
+            entry = self.frame_cache.wait_for_frame(camera["id"], seq, timeout=5)
+            if find_camera is not None:
+                camera = find_camera(camera["id"])
+                if camera is None:
+                    return
+            # Keep the capture loop alive for as long as someone is watching
+            self.ensure_capture(camera)
+            if entry is None:
+                continue
+
+            seq = entry["seq"]
+            yield (b'--frame\r\n'
+                   b'Content-Type: image/jpeg\r\n\r\n' + entry["jpeg"] + b'\r\n')
+
+    def update(self, cameras, capture_defaults=None, idle_timeout=60, max_frame_age=10, default_detector="hand"):
+        """Apply a reloaded config, stopping captures that no longer match their camera entry."""
+        restart_all = (capture_defaults or {}) != self.capture_defaults or default_detector != self.default_detector
+        self.capture_defaults = capture_defaults or {}
+        self.idle_timeout = idle_timeout
+        self.max_frame_age = max_frame_age
+        self.default_detector = default_detector
+
+        by_id = {camera["id"]: camera for camera in cameras}
+        with self.workers_lock:
+            stale = [worker for worker in self.workers.values()
+                     if restart_all or by_id.get(worker.camera_id) != worker.camera]
+            for worker in stale:
+                self._forget(worker)
+        # Viewers restart them with the new camera entry on their next frame
+        for worker in stale:
+            worker.stop()
+
+    def shutdown(self):
+        with self.workers_lock:
+            running = list(self.workers.values())
+            self.workers.clear()
+        for worker in running:
+            worker.stop()